@@ -1,16 +1,23 @@
-﻿import os
+﻿import hashlib
+import os
 import queue
+import re
+import statistics
 import threading
 import time
 import webbrowser
+from urllib.parse import parse_qsl, quote, urlparse
 import json
 import tkinter as tk
 from tkinter import font as tkfont
 from tkinter import filedialog, messagebox, ttk
 
+import numpy as np
 import pandas as pd
+import psutil
 from deep_translator import GoogleTranslator
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
@@ -19,6 +26,27 @@ from webdriver_manager.chrome import ChromeDriverManager
 
 MAX_PAGES = 34
 PAGE_CHANGE_TIMEOUT = 10
+JOBS_FILE = os.path.join(os.path.expanduser("~"), "1688_soft_jobs.json")
+COOKIES_FILE = os.path.join(os.path.expanduser("~"), "1688_soft_cookies.json")
+SEARCH_URL = "https://s.1688.com/selloffer/offer_search.htm?keywords={}"
+SCHEDULER_IDLE_SECONDS = 5
+JOB_NAME_QUERY_KEYS = ("keywords", "categoryId", "cateId", "featurePair", "q")
+HEADLESS_WINDOW_SIZE = "1280,800"
+HEADLESS_DISK_CACHE_BYTES = 64 * 1024 * 1024
+SESSION_COOKIE_DOMAINS = ("1688.com", "alibaba.cn", "alibaba.com", "taobao.com")
+DRIVER_PING_TIMEOUT = 15
+DRIVER_MAX_RESTARTS = 2
+RECYCLE_EVERY_PAGES = 15
+RECYCLE_PRIVATE_MB = 1500
+RECYCLE_LATENCY_WINDOW = 3
+RECYCLE_LATENCY_FACTOR = 2.0
+DEDUP_NUM_PERM = 64
+DEDUP_BANDS = 16
+DEDUP_THRESHOLD = 0.6
+DEDUP_CHUNK_ROWS = 4096
+DEDUP_MAX_IMAGE_ROWS = 20
+DEDUP_IMAGE_MIN_SIMILARITY = 0.3
+DEDUP_INDEX_FILE = "1688_soft_dedup.npz"
 
 
 def translate_text(text, target_lang="ru"):
@@ -30,6 +58,521 @@ def translate_text(text, target_lang="ru"):
         return text
 
 
+def build_chrome_options(headless=False):
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument(f"--window-size={HEADLESS_WINDOW_SIZE}")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-background-networking")
+        options.add_argument("--disable-component-update")
+        options.add_argument("--disable-default-apps")
+        options.add_argument("--disable-sync")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--mute-audio")
+        options.add_argument(f"--disk-cache-size={HEADLESS_DISK_CACHE_BYTES}")
+        options.add_argument("--renderer-process-limit=2")
+    else:
+        options.add_argument("--start-maximized")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option("useAutomationExtension", False)
+    return options
+
+
+_UA_METADATA_SCRIPT = """
+var done = arguments[arguments.length - 1];
+if (!navigator.userAgentData) { done(null); return; }
+navigator.userAgentData.getHighEntropyValues(
+    ["architecture", "bitness", "model", "platformVersion", "fullVersionList", "wow64"]
+).then(done, function () { done(null); });
+"""
+
+
+def _unheadless_brands(brands):
+    return [
+        {"brand": b["brand"].replace("HeadlessChrome", "Google Chrome"), "version": b["version"]}
+        for b in brands or []
+    ]
+
+
+def mask_headless_user_agent(driver):
+    user_agent = driver.execute_script("return navigator.userAgent").replace("HeadlessChrome", "Chrome")
+    override = {"userAgent": user_agent}
+    try:
+        data = driver.execute_async_script(_UA_METADATA_SCRIPT)
+    except Exception:
+        data = None
+    if data:
+        override["userAgentMetadata"] = {
+            "brands": _unheadless_brands(data.get("brands")),
+            "fullVersionList": _unheadless_brands(data.get("fullVersionList")),
+            "platform": data.get("platform", ""),
+            "platformVersion": data.get("platformVersion", ""),
+            "architecture": data.get("architecture", ""),
+            "model": data.get("model", ""),
+            "mobile": bool(data.get("mobile")),
+            "bitness": data.get("bitness", ""),
+            "wow64": bool(data.get("wow64")),
+        }
+    driver.execute_cdp_cmd("Network.setUserAgentOverride", override)
+
+
+_COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+
+def chrome_tree_processes(driver):
+    try:
+        root_proc = psutil.Process(driver.service.process.pid)
+        return [root_proc] + root_proc.children(recursive=True)
+    except Exception:
+        return None
+
+
+def kill_processes(procs):
+    for proc in procs or []:
+        try:
+            proc.kill()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+
+
+def chrome_tree_usage(driver):
+    procs = chrome_tree_processes(driver)
+    if not procs:
+        return None
+
+    rss = 0
+    private = 0
+    cpu_seconds = 0.0
+    count = 0
+    for proc in procs:
+        try:
+            proc_rss = proc.memory_info().rss
+            rss += proc_rss
+            try:
+                full = proc.memory_full_info()
+                private += getattr(full, "pss", full.uss)
+            except psutil.AccessDenied:
+                private += proc_rss
+            cpu = proc.cpu_times()
+            cpu_seconds += cpu.user + cpu.system
+            count += 1
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return {
+        "rss_mb": rss / (1024 * 1024),
+        "private_mb": private / (1024 * 1024),
+        "cpu_seconds": cpu_seconds,
+        "processes": count,
+    }
+
+
+_NON_WORD = re.compile(r"[^\w\n]|_")
+_IMAGE_SIZE_SUFFIX = re.compile(r"(\.(?:jpe?g|png|webp|gif))(?:[_.].*)?$", re.IGNORECASE)
+_MINHASH_EMPTY = np.uint32(0xFFFFFFFF)
+_minhash_rng = np.random.default_rng(1688)
+_MINHASH_A = _minhash_rng.integers(1, 1 << 63, size=DEDUP_NUM_PERM, dtype=np.uint64)[:, None] | np.uint64(1)
+_MINHASH_B = _minhash_rng.integers(0, 1 << 63, size=DEDUP_NUM_PERM, dtype=np.uint64)[:, None]
+_SHINGLE_MIX = np.uint64(0x9E3779B97F4A7C15)
+_BAND_MULT = _minhash_rng.integers(1, 1 << 63, size=DEDUP_NUM_PERM // DEDUP_BANDS, dtype=np.uint64)
+
+
+def title_shingles(titles):
+    text = "\n".join(str(t or "").replace("\n", " ") for t in titles).lower()
+    codes = np.frombuffer(_NON_WORD.sub("", text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    is_sep = codes == 10
+    char_rows = np.cumsum(is_sep)[~is_sep]
+    chars = codes[~is_sep]
+
+    same_row = char_rows[1:] == char_rows[:-1]
+    keys = ((chars[:-1] << np.uint64(21)) | chars[1:])[same_row]
+    rows = char_rows[:-1][same_row]
+
+    single = np.flatnonzero(np.bincount(char_rows, minlength=len(titles)) == 1)
+    keys = np.concatenate((keys, chars[np.searchsorted(char_rows, single)] << np.uint64(21)))
+    rows = np.concatenate((rows, single))
+
+    packed = np.unique((rows.astype(np.uint64) << np.uint64(42)) | keys)
+    return (packed >> np.uint64(42)).astype(np.int64), packed & np.uint64((1 << 42) - 1)
+
+
+def minhash_signatures(titles):
+    titles = list(titles)
+    signatures = np.full((len(titles), DEDUP_NUM_PERM), _MINHASH_EMPTY, dtype=np.uint32)
+    for start in range(0, len(titles), DEDUP_CHUNK_ROWS):
+        rows, keys = title_shingles(titles[start : start + DEDUP_CHUNK_ROWS])
+        if not len(rows):
+            continue
+        offsets = np.flatnonzero(np.concatenate(([True], rows[1:] != rows[:-1])))
+        values = (keys * _SHINGLE_MIX) >> np.uint64(32)
+        hashed = _MINHASH_A * values
+        hashed += _MINHASH_B
+        hashed >>= np.uint64(33)
+        signatures[start + rows[offsets]] = np.minimum.reduceat(hashed, offsets, axis=1).T
+    return signatures
+
+
+def lsh_band_keys(signatures):
+    rows_per_band = DEDUP_NUM_PERM // DEDUP_BANDS
+    bands = signatures.astype(np.uint64).reshape(len(signatures), DEDUP_BANDS, rows_per_band)
+    return (bands * _BAND_MULT).sum(axis=2, dtype=np.uint64)
+
+
+def _url_key(url):
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+def image_key(url):
+    url = str(url or "").strip()
+    if not url or url.startswith("data:"):
+        return 0
+    url = url.split("?", 1)[0].split("#", 1)[0]
+    url = re.sub(r"^(?:https?:)?//", "", url)
+    return _url_key(_IMAGE_SIZE_SUFFIX.sub(r"\1", url))
+
+
+def link_key(url):
+    url = str(url or "").strip()
+    if not url:
+        return 0
+    return _url_key(re.sub(r"^(?:https?:)?//", "", url.split("?", 1)[0].split("#", 1)[0]))
+
+
+class _SortedBuckets:
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.rows = np.empty(0, dtype=np.int64)
+
+    def add(self, keys, rows):
+        order = np.argsort(keys, kind="stable")
+        keys, rows = keys[order], rows[order]
+        positions = np.searchsorted(self.keys, keys, side="right")
+        self.keys = np.insert(self.keys, positions, keys)
+        self.rows = np.insert(self.rows, positions, rows)
+        reps = self.rows[np.searchsorted(self.keys, keys, side="left")]
+        linked = reps != rows
+        return rows[linked], reps[linked]
+
+    def count(self, keys):
+        return np.searchsorted(self.keys, keys, side="right") - np.searchsorted(self.keys, keys, side="left")
+
+    def first(self, keys):
+        positions = np.searchsorted(self.keys, keys, side="left")
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == keys[found]
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        rows[found] = self.rows[positions[found]]
+        return rows
+
+
+class OfferDeduplicator:
+    def __init__(self):
+        self.size = 0
+        self.signatures = np.empty((DEDUP_CHUNK_ROWS, DEDUP_NUM_PERM), dtype=np.uint32)
+        self.parent = np.arange(DEDUP_CHUNK_ROWS, dtype=np.int64)
+        self.image_keys = np.zeros(DEDUP_CHUNK_ROWS, dtype=np.uint64)
+        self.link_keys = np.zeros(DEDUP_CHUNK_ROWS, dtype=np.uint64)
+        self.buckets = [_SortedBuckets() for _ in range(DEDUP_BANDS + 1)]
+        self.links = _SortedBuckets()
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def load(cls, path):
+        dedup = cls()
+        try:
+            with np.load(path) as data:
+                signatures, parent = data["signatures"], data["parent"]
+                image_keys, link_keys = data["image_keys"], data["link_keys"]
+        except Exception:
+            return dedup
+        if signatures.ndim != 2 or signatures.shape[1] != DEDUP_NUM_PERM:
+            return dedup
+
+        size = len(signatures)
+        dedup._grow(max(size, DEDUP_CHUNK_ROWS))
+        dedup.signatures[:size] = signatures
+        dedup.parent[:size] = parent
+        dedup.image_keys[:size] = image_keys
+        dedup.link_keys[:size] = link_keys
+        dedup.size = size
+        dedup._index(np.arange(size, dtype=np.int64))
+        return dedup
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                signatures=self.signatures[: self.size],
+                parent=self.parent[: self.size],
+                image_keys=self.image_keys[: self.size],
+                link_keys=self.link_keys[: self.size],
+            )
+        os.replace(tmp_path, path)
+
+    def add(self, titles, images, links=None):
+        titles, images = list(titles), list(images)
+        links = list(links) if links is not None else [""] * len(titles)
+        link_keys = np.fromiter((link_key(u) for u in links), dtype=np.uint64, count=len(titles))
+        rows = self.links.first(link_keys)
+        rows[link_keys == 0] = -1
+        fresh = np.flatnonzero(rows < 0)
+        if not len(fresh):
+            return rows
+
+        start = self.size
+        end = start + len(fresh)
+        if end > len(self.parent):
+            self._grow(max(end, 2 * len(self.parent)))
+        self.signatures[start:end] = minhash_signatures([titles[i] for i in fresh])
+        self.image_keys[start:end] = np.fromiter(
+            (image_key(images[i]) for i in fresh), dtype=np.uint64, count=len(fresh)
+        )
+        self.link_keys[start:end] = link_keys[fresh]
+        self.size = end
+
+        new_rows = np.arange(start, end, dtype=np.int64)
+        self._union(*self._index(new_rows))
+        rows[fresh] = new_rows
+        return rows
+
+    def cluster_ids(self, rows=None):
+        if rows is None:
+            rows = np.arange(self.size)
+        return (self._find(np.asarray(rows, dtype=np.int64)) + 1).tolist()
+
+    def _index(self, new_rows):
+        linked_rows, linked_reps = [], []
+        signatures = self.signatures[new_rows]
+        has_title = signatures[:, 0] != _MINHASH_EMPTY
+        band_keys = lsh_band_keys(signatures[has_title])
+        for band in range(DEDUP_BANDS):
+            rows, reps = self.buckets[band].add(band_keys[:, band], new_rows[has_title])
+            similarity = (self.signatures[rows] == self.signatures[reps]).mean(axis=1)
+            keep = similarity >= DEDUP_THRESHOLD
+            linked_rows.append(rows[keep])
+            linked_reps.append(reps[keep])
+
+        image_keys = self.image_keys[new_rows]
+        has_image = image_keys != 0
+        images = self.buckets[DEDUP_BANDS]
+        rows, reps = images.add(image_keys[has_image], new_rows[has_image])
+        similarity = (self.signatures[rows] == self.signatures[reps]).mean(axis=1)
+        titled = (self.signatures[rows, 0] != _MINHASH_EMPTY) & (self.signatures[reps, 0] != _MINHASH_EMPTY)
+        keep = titled & (similarity >= DEDUP_IMAGE_MIN_SIMILARITY)
+        keep &= images.count(self.image_keys[rows]) <= DEDUP_MAX_IMAGE_ROWS
+        linked_rows.append(rows[keep])
+        linked_reps.append(reps[keep])
+
+        link_keys = self.link_keys[new_rows]
+        self.links.add(link_keys[link_keys != 0], new_rows[link_keys != 0])
+        return np.concatenate(linked_rows), np.concatenate(linked_reps)
+
+    def _grow(self, capacity):
+        signatures = np.empty((capacity, DEDUP_NUM_PERM), dtype=np.uint32)
+        signatures[: self.size] = self.signatures[: self.size]
+        parent = np.arange(capacity, dtype=np.int64)
+        parent[: self.size] = self.parent[: self.size]
+        image_keys = np.zeros(capacity, dtype=np.uint64)
+        image_keys[: self.size] = self.image_keys[: self.size]
+        link_keys = np.zeros(capacity, dtype=np.uint64)
+        link_keys[: self.size] = self.link_keys[: self.size]
+        self.signatures, self.parent = signatures, parent
+        self.image_keys, self.link_keys = image_keys, link_keys
+
+    def _find(self, rows):
+        roots = self.parent[rows]
+        while True:
+            up = self.parent[roots]
+            if np.array_equal(up, roots):
+                break
+            roots = up
+        self.parent[rows] = roots
+        return roots
+
+    def _union(self, rows, reps):
+        while len(rows):
+            a, b = self._find(rows), self._find(reps)
+            pending = a != b
+            rows, reps = np.maximum(a, b)[pending], np.minimum(a, b)[pending]
+            np.minimum.at(self.parent, rows, reps)
+
+
+def export_cookies(driver):
+    try:
+        cookies = driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+    except Exception:
+        return None
+    return [c for c in cookies if is_session_domain(c.get("domain", ""))]
+
+
+def is_session_domain(domain):
+    domain = domain.lstrip(".").lower()
+    return any(domain == d or domain.endswith("." + d) for d in SESSION_COOKIE_DOMAINS)
+
+
+def import_cookies(driver, cookies):
+    params = []
+    for cookie in cookies or []:
+        param = {k: cookie[k] for k in _COOKIE_FIELDS if k in cookie}
+        if cookie.get("session") or param.get("expires", 0) < 0:
+            param.pop("expires", None)
+        params.append(param)
+    if params:
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": params})
+
+
+def load_cookies(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def save_cookies(path, cookies):
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(cookies, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class DriverHealth:
+    def __init__(self):
+        self.page_times = []
+        self.total_times = []
+        self.generation_start = 0
+        self.worn_times = []
+        self.restarts = 0
+        self.restart_seconds = 0.0
+
+    def record_page(self, driver_seconds, total_seconds):
+        self.page_times.append(driver_seconds)
+        self.total_times.append(total_seconds)
+
+    def check(self, usage):
+        current = self.page_times[self.generation_start :]
+        if len(current) >= RECYCLE_EVERY_PAGES:
+            return f"{len(current)} стр. без перезапуска"
+        if usage and usage["private_mb"] > RECYCLE_PRIVATE_MB:
+            return f"память {usage['private_mb']:.0f} МБ"
+        if len(current) >= 2 * RECYCLE_LATENCY_WINDOW:
+            baseline = statistics.median(current[:RECYCLE_LATENCY_WINDOW])
+            recent = statistics.median(current[-RECYCLE_LATENCY_WINDOW:])
+            if recent > baseline * RECYCLE_LATENCY_FACTOR:
+                return f"загрузка страницы {recent:.1f} с вместо {baseline:.1f} с"
+        return None
+
+    def restarted(self, seconds):
+        self.worn_times.extend(self.page_times[self.generation_start :][-RECYCLE_LATENCY_WINDOW:])
+        self.generation_start = len(self.page_times)
+        self.restarts += 1
+        self.restart_seconds += seconds
+
+    def summary(self):
+        if not self.page_times:
+            return None
+        pages = len(self.page_times)
+        overall = pages * 60 / (sum(self.total_times) + self.restart_seconds)
+        browser = pages * 60 / (sum(self.page_times) + self.restart_seconds)
+        message = f"Скорость: {overall:.1f} стр/мин в целом, браузер {browser:.1f} стр/мин"
+        if not self.restarts or not self.worn_times:
+            return message + "."
+        worn = 60 / statistics.mean(self.worn_times)
+        return (
+            f"{message} с учетом перезапусков: {self.restarts} ({self.restart_seconds:.0f} с). "
+            f"Без перезапуска браузер к этому моменту давал {worn:.1f} стр/мин ({(browser / worn - 1) * 100:+.0f}%)."
+        )
+
+
+def load_jobs(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return []
+    if not isinstance(data, list):
+        return []
+
+    jobs = []
+    for raw in data:
+        if not isinstance(raw, dict) or raw.get("kind") not in ("url", "keyword"):
+            continue
+        if not isinstance(raw.get("id"), int) or not isinstance(raw.get("target"), str) or not raw["target"]:
+            continue
+        job = {
+            "name": raw["target"][:60],
+            "priority": 5,
+            "max_pages": MAX_PAGES,
+            "max_minutes": 60.0,
+            "interval_hours": 0.0,
+            "next_run": 0.0,
+            "last_run": None,
+            "last_items": 0,
+            "status": "",
+            "main_category": "",
+            "group": "",
+        }
+        job.update(raw)
+        try:
+            job["name"] = str(job["name"])
+            job["priority"] = int(job["priority"])
+            job["max_pages"] = max(1, int(job["max_pages"]))
+            job["max_minutes"] = float(job["max_minutes"])
+            job["interval_hours"] = float(job["interval_hours"])
+            job["next_run"] = None if job["next_run"] is None else float(job["next_run"])
+            job["last_items"] = int(job["last_items"])
+            job["status"] = str(job["status"])
+            job["main_category"] = str(job["main_category"])
+            job["group"] = str(job["group"])
+        except (TypeError, ValueError):
+            continue
+        jobs.append(job)
+    return jobs
+
+
+def save_jobs(path, jobs):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(jobs, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def job_url(job):
+    if job["kind"] == "keyword":
+        return SEARCH_URL.format(quote(job["target"].encode("gbk", errors="ignore")))
+    return job["target"]
+
+
+def job_name_from_url(url):
+    parsed = urlparse(url)
+    segments = [seg for seg in parsed.path.split("/") if seg]
+    parts = [os.path.splitext(segments[-1])[0]] if segments else [parsed.netloc]
+    try:
+        query = dict(parse_qsl(parsed.query, encoding="utf-8", errors="strict"))
+    except UnicodeDecodeError:
+        query = dict(parse_qsl(parsed.query, encoding="gbk", errors="replace"))
+    for key in JOB_NAME_QUERY_KEYS:
+        if query.get(key):
+            parts.append(query[key])
+            break
+    return " ".join(parts)[:60]
+
+
+def next_due_job(jobs, now):
+    due = [j for j in jobs if j["next_run"] is not None and j["next_run"] <= now]
+    if not due:
+        return None
+    return min(due, key=lambda j: (-j["priority"], j["next_run"]))
+
+
 def smooth_scroll(driver, scroll_pause_time=0.3):
     last_height = driver.execute_script("return document.body.scrollHeight")
     while True:
@@ -49,7 +592,8 @@ def smooth_scroll(driver, scroll_pause_time=0.3):
             last_height = new_height
 
 
-def scrape_items_on_page(driver, log):
+def scrape_items_on_page(driver, log, timing=None):
+    load_started = time.time()
     try:
         WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, ".i18n-card-wrap[data-renderkey]"))
@@ -60,6 +604,8 @@ def scrape_items_on_page(driver, log):
     smooth_scroll(driver)
     driver.execute_script("window.scrollTo(0, 0);")
     time.sleep(0.5)
+    if timing is not None:
+        timing["load"] = timing.get("load", 0.0) + time.time() - load_started
 
     cards = driver.find_elements(By.CSS_SELECTOR, "[data-renderkey]")
     cards = [c for c in cards if "i18n-card-wrap" in c.get_attribute("class")]
@@ -152,6 +698,13 @@ class ScraperApp:
         self.root.resizable(False, False)
 
         self.driver = None
+        self.driver_path = None
+        self.headless = False
+        self.session_cookies = None
+        self.health = None
+        self.crawl_items = 0
+        self.session_started = None
+        self.session_peak_rss = 0.0
         self.main_categories = []
         self.subcategories = []
         self.subcategories_for_main = None
@@ -160,6 +713,13 @@ class ScraperApp:
 
         self.log_queue = queue.Queue()
 
+        self.jobs_lock = threading.Lock()
+        self.jobs = load_jobs(JOBS_FILE)
+        for job in self.jobs:
+            if job["status"].startswith("Стр.") or job["status"] == "Выполняется":
+                job["status"] = "Прервано"
+        self.jobs_dirty = True
+
         self._build_ui()
         self.root.after(100, self._process_log_queue)
 
@@ -262,21 +822,80 @@ class ScraperApp:
         self.export_path_var = tk.StringVar(value=os.getcwd())
         ttk.Entry(params, textvariable=self.export_path_var, width=44).grid(row=2, column=1, sticky="ew")
 
+        self.headless_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(params, text="Фоновый режим (без окна браузера)", variable=self.headless_var).grid(
+            row=3, column=1, sticky="w", pady=(8, 0)
+        )
+
         path_actions = ttk.Frame(params, style="App.TFrame")
-        path_actions.grid(row=3, column=1, sticky="e", pady=(8, 0))
+        path_actions.grid(row=4, column=1, sticky="e", pady=(8, 0))
         ttk.Button(path_actions, text="Выбрать папку", style="Ghost.TButton", command=self.choose_export_path).grid(
             row=0, column=0, sticky="e"
         )
-        ttk.Button(path_actions, text="Связь: @EcommerceGr", style="Danger.TButton", command=self.open_contact).grid(
+        ttk.Button(path_actions, text="Найти дубли в CSV", style="Ghost.TButton", command=self.start_dedup).grid(
             row=0, column=1, sticky="e", padx=(8, 0)
         )
+        ttk.Button(path_actions, text="Связь: @EcommerceGr", style="Danger.TButton", command=self.open_contact).grid(
+            row=0, column=2, sticky="e", padx=(8, 0)
+        )
+
+        jobs_frame = ttk.LabelFrame(main_frame, text="Очередь заданий", padding=12)
+        jobs_frame.grid(row=3, column=0, sticky="ew", pady=(10, 0))
+        jobs_frame.columnconfigure(1, weight=1)
+
+        ttk.Label(jobs_frame, text="Ссылка или запрос:", style="Card.TLabel").grid(row=0, column=0, sticky="w", pady=(0, 6))
+        self.job_target_var = tk.StringVar()
+        ttk.Entry(jobs_frame, textvariable=self.job_target_var, width=44).grid(row=0, column=1, sticky="ew", pady=(0, 6))
+
+        self.job_priority_var = tk.StringVar(value="5")
+        self.job_pages_var = tk.StringVar(value=str(MAX_PAGES))
+        self.job_minutes_var = tk.StringVar(value="60")
+        self.job_interval_var = tk.StringVar(value="0")
+        limits = ttk.Frame(jobs_frame, style="App.TFrame")
+        limits.grid(row=1, column=0, columnspan=2, sticky="w")
+        limit_fields = [
+            ("Приоритет:", self.job_priority_var),
+            ("Страниц:", self.job_pages_var),
+            ("Минут:", self.job_minutes_var),
+            ("Повтор, ч:", self.job_interval_var),
+        ]
+        for col, (label, var) in enumerate(limit_fields):
+            ttk.Label(limits, text=label).grid(row=0, column=col * 2, sticky="w", padx=(0 if col == 0 else 12, 4))
+            ttk.Entry(limits, textvariable=var, width=6).grid(row=0, column=col * 2 + 1, sticky="w")
+
+        job_columns = [
+            ("name", "Задание", 170),
+            ("priority", "Приор.", 50),
+            ("pages", "Стр.", 40),
+            ("minutes", "Мин.", 40),
+            ("interval", "Повтор", 60),
+            ("next_run", "Следующий запуск", 110),
+            ("status", "Статус", 100),
+        ]
+        self.jobs_view = ttk.Treeview(
+            jobs_frame, columns=[c[0] for c in job_columns], show="headings", height=5, selectmode="browse"
+        )
+        for key, title, width in job_columns:
+            self.jobs_view.heading(key, text=title)
+            self.jobs_view.column(key, width=width, anchor="w" if key in ("name", "status") else "center")
+        self.jobs_view.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(8, 0))
+
+        job_actions = ttk.Frame(jobs_frame, style="App.TFrame")
+        job_actions.grid(row=3, column=0, columnspan=2, sticky="e", pady=(8, 0))
+        ttk.Button(job_actions, text="Добавить", style="Ghost.TButton", command=self.add_job).grid(row=0, column=0)
+        ttk.Button(job_actions, text="Удалить", style="Ghost.TButton", command=self.remove_job).grid(
+            row=0, column=1, padx=(8, 0)
+        )
+        ttk.Button(job_actions, text="Запустить очередь", style="Primary.TButton", command=self.start_queue).grid(
+            row=0, column=2, padx=(8, 0)
+        )
 
-        ttk.Separator(main_frame, orient="horizontal").grid(row=3, column=0, sticky="ew", pady=(12, 8))
+        ttk.Separator(main_frame, orient="horizontal").grid(row=4, column=0, sticky="ew", pady=(12, 8))
 
-        ttk.Label(main_frame, text="Логирование", style="Sub.TLabel").grid(row=4, column=0, sticky="w")
+        ttk.Label(main_frame, text="Логирование", style="Sub.TLabel").grid(row=5, column=0, sticky="w")
         self.log_text = tk.Text(
             main_frame,
-            height=18,
+            height=12,
             width=72,
             state="disabled",
             bg=colors["card"],
@@ -287,7 +906,7 @@ class ScraperApp:
             highlightbackground=colors["border"],
             highlightcolor=colors["border"],
         )
-        self.log_text.grid(row=5, column=0, sticky="ew", pady=(6, 0))
+        self.log_text.grid(row=6, column=0, sticky="ew", pady=(6, 0))
         self._bind_log_copy()
 
     def log(self, message):
@@ -301,8 +920,37 @@ class ScraperApp:
             self.log_text.insert("end", message + "\n")
             self.log_text.see("end")
             self.log_text.configure(state="disabled")
+        if self.jobs_dirty:
+            self._refresh_jobs_view()
         self.root.after(100, self._process_log_queue)
 
+    def _refresh_jobs_view(self):
+        self.jobs_dirty = False
+        selected = self.jobs_view.selection()
+        self.jobs_view.delete(*self.jobs_view.get_children())
+        with self.jobs_lock:
+            jobs = sorted((dict(j) for j in self.jobs), key=lambda j: -j["priority"])
+        for job in jobs:
+            next_run = time.strftime("%d.%m %H:%M", time.localtime(job["next_run"])) if job["next_run"] else "—"
+            interval = f"{job['interval_hours']:g} ч" if job["interval_hours"] else "разово"
+            self.jobs_view.insert(
+                "",
+                "end",
+                iid=str(job["id"]),
+                values=(
+                    job["name"],
+                    job["priority"],
+                    job["max_pages"],
+                    f"{job['max_minutes']:g}",
+                    interval,
+                    next_run,
+                    job["status"],
+                ),
+            )
+        for iid in selected:
+            if self.jobs_view.exists(iid):
+                self.jobs_view.selection_set(iid)
+
     def _bind_log_copy(self):
         menu = tk.Menu(self.log_text, tearoff=0)
         menu.add_command(label="Копировать", command=self._copy_log_selection)
@@ -334,6 +982,41 @@ class ScraperApp:
         if path:
             self.export_path_var.set(path)
 
+    def start_dedup(self):
+        if self.running:
+            self.log("Процесс уже выполняется.")
+            return
+        path = filedialog.askopenfilename(
+            initialdir=self.export_path_var.get(), filetypes=[("CSV", "*.csv"), ("Все файлы", "*.*")]
+        )
+        if not path:
+            return
+        self.running = True
+        threading.Thread(target=self._dedup_worker, args=(path,), daemon=True).start()
+
+    def _dedup_worker(self, path):
+        try:
+            started = time.time()
+            self.log(f"Поиск дублей: {path}")
+            df = pd.read_csv(path, sep=";", encoding="utf-8-sig", dtype=str, keep_default_na=False)
+            if "Title_CN" not in df.columns or "Image" not in df.columns:
+                self.log("В файле нет колонок Title_CN и Image.")
+                return
+            dedup = OfferDeduplicator()
+            links = df["Link"] if "Link" in df.columns else None
+            df["Cluster_ID"] = dedup.cluster_ids(dedup.add(df["Title_CN"], df["Image"], links))
+            out_path = os.path.splitext(path)[0] + "_clusters.csv"
+            df.to_csv(out_path, index=False, encoding="utf-8-sig", sep=";")
+            clusters = df["Cluster_ID"].nunique()
+            self.log(
+                f"Строк: {len(df)}, групп: {clusters}, дублей: {len(df) - clusters} "
+                f"({time.time() - started:.1f} с). Файл: {out_path}"
+            )
+        except Exception as exc:
+            self.log(f"Ошибка поиска дублей: {exc}")
+        finally:
+            self.running = False
+
     def start_browser(self, url):
         if self.running:
             self.log("Процесс уже выполняется.")
@@ -346,26 +1029,105 @@ class ScraperApp:
 
     def _start_browser_worker(self, url):
         try:
-            options = webdriver.ChromeOptions()
-            options.add_argument("--start-maximized")
-            options.add_argument("--disable-blink-features=AutomationControlled")
-            options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            options.add_experimental_option("useAutomationExtension", False)
-
-            self.driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+            self.headless = self.headless_var.get()
+            saved_cookies = load_cookies(COOKIES_FILE) if self.headless else None
+            if self.headless and not saved_cookies:
+                self.log("Нет сохраненного входа для фонового режима.")
+                self.log("Откройте браузер без фонового режима и войдите.")
+                self.log("Затем отметьте 'Фоновый режим' и нажмите 'Начать парсинг' - вход сохранится.")
+                return
+            self._launch_driver()
+            if saved_cookies:
+                import_cookies(self.driver, saved_cookies)
+                self.session_cookies = saved_cookies
             self.log(f"Открываем {url} ...")
             self.driver.get(url)
             if "1688.com" in url:
                 self.log("RU версия: интерфейс на русском, но подкатегорий меньше.")
-            self.log("ЭТАП 1: ВХОД")
-            self.log("1. Войдите в аккаунт.")
-            self.log("2. После входа нажмите 'Начать парсинг'.")
+            if self.headless:
+                self.log("Браузер запущен в фоновом режиме с сохраненным входом.")
+                self.log("Нажмите 'Начать парсинг'. Если категории не найдутся, войдите заново без фонового режима.")
+            else:
+                self.log("ЭТАП 1: ВХОД")
+                self.log("1. Войдите в аккаунт.")
+                self.log("2. После входа нажмите 'Начать парсинг'.")
         except Exception as exc:
             self.log(f"Ошибка запуска браузера: {exc}")
             self.driver = None
         finally:
             self.running = False
 
+    def _launch_driver(self):
+        if not self.driver_path:
+            self.driver_path = ChromeDriverManager().install()
+        options = build_chrome_options(headless=self.headless)
+        self.driver = webdriver.Chrome(service=Service(self.driver_path), options=options)
+        if self.headless:
+            try:
+                mask_headless_user_agent(self.driver)
+            except Exception as exc:
+                self.log(f"Не удалось заменить User-Agent: {exc}")
+        self.session_started = time.time()
+        self.session_peak_rss = 0.0
+
+    def _remember_session(self):
+        cookies = export_cookies(self.driver)
+        if not cookies:
+            return
+        self.session_cookies = cookies
+        if not self.headless_var.get():
+            return
+        try:
+            save_cookies(COOKIES_FILE, cookies)
+        except Exception as exc:
+            self.log(f"Не удалось сохранить вход: {exc}")
+
+    def _driver_responsive(self):
+        result = {}
+
+        def ping():
+            try:
+                result["state"] = self.driver.execute_script("return document.readyState")
+            except Exception:
+                pass
+
+        pinger = threading.Thread(target=ping, daemon=True)
+        pinger.start()
+        pinger.join(DRIVER_PING_TIMEOUT)
+        return "state" in result
+
+    def _recycle_driver(self, url, target_page, reason):
+        self.log(f"Перезапуск браузера ({reason}). Продолжаем со страницы {target_page}.")
+        started = time.time()
+        self._close_driver()
+        try:
+            self._launch_driver()
+        except Exception as exc:
+            self.log(f"Не удалось перезапустить браузер: {exc}")
+            return False
+        try:
+            import_cookies(self.driver, self.session_cookies)
+        except Exception as exc:
+            self.log(f"Не удалось перенести cookies: {exc}")
+        try:
+            self._open_listing(url)
+            ok = target_page == 1 or self._go_to_page(target_page)
+        except WebDriverException:
+            ok = False
+        self.health.restarted(time.time() - started)
+        if not ok:
+            self.log(f"Не удалось открыть страницу {target_page} после перезапуска.")
+        return ok
+
+    def _open_listing(self, url):
+        self.driver.get(url)
+        try:
+            WebDriverWait(self.driver, 5).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "a[class*='i18n-card-wrap']"))
+            )
+        except Exception:
+            time.sleep(1)
+
     def start_parsing(self):
         if self.running:
             self.log("Процесс уже выполняется.")
@@ -377,6 +1139,175 @@ class ScraperApp:
         self.running = True
         threading.Thread(target=self._parse_worker, daemon=True).start()
 
+    def add_job(self):
+        try:
+            priority = int(self.job_priority_var.get())
+            max_pages = int(self.job_pages_var.get())
+            max_minutes = float(self.job_minutes_var.get())
+            interval_hours = float(self.job_interval_var.get())
+        except ValueError:
+            self.log("Проверьте числа: приоритет, страницы, минуты и повтор.")
+            return
+        if max_pages < 1 or max_minutes < 0 or interval_hours < 0:
+            self.log("Страниц должно быть не меньше 1, минуты и повтор не могут быть отрицательными.")
+            return
+
+        with self.jobs_lock:
+            job_id = max((j["id"] for j in self.jobs), default=0) + 1
+        job = {
+            "id": job_id,
+            "priority": priority,
+            "max_pages": max_pages,
+            "max_minutes": max_minutes,
+            "interval_hours": interval_hours,
+            "next_run": time.time(),
+            "last_run": None,
+            "last_items": 0,
+            "status": "В очереди",
+        }
+
+        target = self.job_target_var.get().strip()
+        if target.startswith("http"):
+            job.update(kind="url", target=target, name=job_name_from_url(target), main_category="", group="")
+        elif target:
+            job.update(kind="keyword", target=target, name=target, main_category="", group="")
+        elif self.subcategories:
+            sub_idx = self._parse_index(self.sub_cat_var.get(), len(self.subcategories), "подкатегории")
+            if sub_idx is None:
+                return
+            sub = self.subcategories[sub_idx]
+            job.update(
+                kind="url",
+                target=sub["url"],
+                name=sub["name"],
+                main_category=self.main_categories[self.subcategories_for_main],
+                group=sub["group"],
+            )
+        else:
+            self.log("Введите ссылку или поисковый запрос, либо выберите подкатегорию.")
+            return
+
+        with self.jobs_lock:
+            self.jobs.append(job)
+        self._save_jobs()
+        self.job_target_var.set("")
+        self.log(f"Задание добавлено: {job['name']}")
+
+    def remove_job(self):
+        selected = self.jobs_view.selection()
+        if not selected:
+            self.log("Выберите задание в списке.")
+            return
+        job_id = int(selected[0])
+        with self.jobs_lock:
+            self.jobs = [j for j in self.jobs if j["id"] != job_id]
+        self._save_jobs()
+
+    def _update_job(self, job, **changes):
+        with self.jobs_lock:
+            job.update(changes)
+        self._save_jobs()
+
+    def _save_jobs(self):
+        try:
+            with self.jobs_lock:
+                save_jobs(JOBS_FILE, self.jobs)
+        except Exception as exc:
+            self.log(f"Не удалось сохранить очередь: {exc}")
+        self.jobs_dirty = True
+
+    def start_queue(self):
+        if self.running:
+            self.log("Процесс уже выполняется.")
+            return
+        self.stop_requested = False
+        if not self.driver:
+            messagebox.showwarning("1688_soft", "Сначала откройте браузер.")
+            return
+        self.running = True
+        threading.Thread(target=self._queue_worker, daemon=True).start()
+
+    def _queue_worker(self):
+        self.log("Очередь заданий запущена.")
+        idle_logged = False
+        try:
+            while not self.stop_requested:
+                with self.jobs_lock:
+                    job = next_due_job(self.jobs, time.time())
+                    upcoming = [j["next_run"] for j in self.jobs if j["next_run"] is not None]
+                if not job:
+                    if not idle_logged:
+                        if upcoming:
+                            next_at = time.strftime("%d.%m %H:%M", time.localtime(min(upcoming)))
+                            self.log(f"Ожидание следующего задания ({next_at}).")
+                        else:
+                            self.log("Нет запланированных заданий. Добавьте задание или нажмите 'Стоп'.")
+                        idle_logged = True
+                    time.sleep(SCHEDULER_IDLE_SECONDS)
+                    continue
+                idle_logged = False
+
+                export_dir = self._get_export_dir()
+                if not export_dir:
+                    break
+                if not self._ensure_driver():
+                    self.log("Не удалось запустить браузер для следующего задания. Очередь остановлена.")
+                    break
+                self._run_job(job, export_dir)
+        finally:
+            if self.stop_requested:
+                self._close_driver()
+                self.log("Браузер закрыт.")
+            self.log("Очередь заданий остановлена.")
+            self.running = False
+
+    def _ensure_driver(self):
+        if self.driver and self._driver_responsive():
+            return True
+        self.log("Браузер не отвечает. Перезапускаем перед следующим заданием...")
+        self._close_driver()
+        try:
+            self._launch_driver()
+        except Exception as exc:
+            self.log(f"Ошибка запуска браузера: {exc}")
+            return False
+        try:
+            import_cookies(self.driver, self.session_cookies)
+        except Exception as exc:
+            self.log(f"Не удалось перенести cookies: {exc}")
+        return True
+
+    def _run_job(self, job, export_dir):
+        started = time.time()
+        self.log(f"=== Задание: {job['name']} (приоритет {job['priority']}) ===")
+        self._update_job(job, status="Выполняется", last_run=started)
+        deadline = started + job["max_minutes"] * 60 if job["max_minutes"] else None
+        labels = {
+            "Main_Category": job["main_category"],
+            "Sub_Group": job["group"],
+            "Sub_Category": job["name"],
+        }
+
+        def progress(page_num, max_pages):
+            self._update_job(job, status=f"Стр. {page_num}/{max_pages}")
+
+        suffix = time.strftime("_%Y%m%d_%H%M", time.localtime(started)) if job["interval_hours"] else ""
+        try:
+            items = self._crawl(
+                job_url(job), job["name"], labels, export_dir, job["max_pages"], deadline, progress, suffix
+            )
+            status = f"Готово: {items}"
+        except Exception as exc:
+            self.log(f"Ошибка задания '{job['name']}': {exc}")
+            items = self.crawl_items
+            status = f"Ошибка (собрано {items})"
+
+        if self.stop_requested:
+            self._update_job(job, status="Остановлено", last_items=items)
+            return
+        next_run = started + job["interval_hours"] * 3600 if job["interval_hours"] else None
+        self._update_job(job, status=status, last_items=items, next_run=next_run)
+
     def stop_parsing(self):
         if not self.running:
             self.log("Нет активного процесса для остановки.")
@@ -388,6 +1319,7 @@ class ScraperApp:
         log_final = True
         final_message = "Работа завершена."
         try:
+            self._remember_session()
             if not self.main_categories:
                 self._scan_main_categories()
                 self.log("Введите номер главной категории и нажмите 'Начать парсинг' еще раз.")
@@ -412,85 +1344,126 @@ class ScraperApp:
                 log_final = False
                 return
 
-            export_dir = self.export_path_var.get().strip()
+            export_dir = self._get_export_dir()
             if not export_dir:
-                self.log("Укажите путь экспорта.")
-                log_final = False
-                return
-            if not os.path.isdir(export_dir):
-                self.log("Путь экспорта не найден. Выберите существующую папку.")
                 log_final = False
                 return
 
-            selected_main_cat_name = self.main_categories[main_idx]
             selected_sub = self.subcategories[sub_idx]
+            labels = {
+                "Main_Category": self.main_categories[main_idx],
+                "Sub_Group": selected_sub["group"],
+                "Sub_Category": selected_sub["name"],
+            }
+            self._crawl(selected_sub["url"], selected_sub["name"], labels, export_dir, MAX_PAGES)
+            if self.stop_requested:
+                final_message = "Работа остановлена."
+        except Exception as exc:
+            self.log(f"Произошла ошибка: {exc}")
+            self.log("Не волнуйтесь, всё что успели собрать до этого момента - уже в файле CSV.")
+        finally:
+            if self.stop_requested:
+                self._close_driver()
+                self.log("Браузер закрыт.")
+            if log_final:
+                self.log(final_message)
+            self.running = False
 
-            safe_name = "".join([c for c in selected_sub["name"] if c.isalpha() or c.isdigit()]).rstrip()
-            if not safe_name:
-                safe_name = "export"
-            filename = os.path.join(export_dir, f"parsed_{safe_name}.csv")
-            json_filename = os.path.join(export_dir, f"parsed_{safe_name}.json")
-
-            if os.path.exists(filename):
-                os.remove(filename)
-            if os.path.exists(json_filename):
-                os.remove(json_filename)
-
-            self.log(f"Парсинг: {selected_sub['name']}")
-            self.log(f"Данные будут сохраняться в: {filename} (после каждой страницы)")
-
-            self.driver.get(selected_sub["url"])
-            try:
-                WebDriverWait(self.driver, 5).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "a[class*='i18n-card-wrap']"))
-                )
-            except Exception:
-                time.sleep(1)
-
-            page_num = 1
-            max_pages = self._get_total_pages() or MAX_PAGES
-            if max_pages < 1:
-                max_pages = MAX_PAGES
-            total_items_collected = 0
-
-            cols = [
-                "Main_Category",
-                "Sub_Group",
-                "Sub_Category",
-                "Title_CN",
-                "Title_RU",
-                "Price",
-                "MOQ",
-                "Sales",
-                "Rating",
-                "Return_Rate",
-                "Promo",
-                "Link",
-                "Image",
-            ]
+    def _crawl(self, url, name, labels, export_dir, page_budget, deadline=None, progress=None, file_suffix=""):
+        safe_name = "".join([c for c in name if c.isalpha() or c.isdigit()]).rstrip()
+        if not safe_name:
+            safe_name = "export"
+        safe_name += file_suffix
+        self.crawl_items = 0
+        filename = os.path.join(export_dir, f"parsed_{safe_name}.csv")
+        json_filename = os.path.join(export_dir, f"parsed_{safe_name}.json")
+
+        if os.path.exists(filename):
+            os.remove(filename)
+        if os.path.exists(json_filename):
+            os.remove(json_filename)
+
+        self.log(f"Парсинг: {name}")
+        self.log(f"Данные будут сохраняться в: {filename} (после каждой страницы)")
+
+        self._remember_session()
+        self.health = DriverHealth()
+        nav_started = time.time()
+        self._open_listing(url)
+        nav_seconds = time.time() - nav_started
+
+        page_num = 1
+        max_pages = self._get_total_pages(page_budget) or page_budget
+        total_items_collected = 0
+        dedup_path = os.path.join(export_dir, DEDUP_INDEX_FILE)
+        dedup = OfferDeduplicator.load(dedup_path)
+        export_rows = []
+        written_ids = []
+
+        cols = [
+            "Main_Category",
+            "Sub_Group",
+            "Sub_Category",
+            "Title_CN",
+            "Title_RU",
+            "Price",
+            "MOQ",
+            "Sales",
+            "Rating",
+            "Return_Rate",
+            "Promo",
+            "Link",
+            "Image",
+            "Cluster_ID",
+        ]
 
+        try:
+            page_mark = time.time()
+            page_restarts = 0
             while page_num <= max_pages:
                 if self.stop_requested:
                     self.log("Остановлено пользователем.")
                     break
+                if deadline and time.time() >= deadline:
+                    self.log("Лимит времени задания исчерпан.")
+                    break
                 self.log(f"--- Страница {page_num} ---")
+                if progress:
+                    progress(page_num, max_pages)
 
                 items = []
-                for attempt in range(2):
-                    items = scrape_items_on_page(self.driver, self.log)
-                    if items:
+                timing = {"load": nav_seconds}
+                try:
+                    for attempt in range(2):
+                        items = scrape_items_on_page(self.driver, self.log, timing)
+                        if items:
+                            break
+                        if attempt == 0:
+                            self.log("Пусто. Возможно, страница еще грузится или нужен вход/регистрация.")
+                            time.sleep(2)
+                except WebDriverException:
+                    if page_restarts >= DRIVER_MAX_RESTARTS or self._driver_responsive():
+                        raise
+                    page_restarts += 1
+                    if not self._recycle_driver(url, page_num, "браузер не отвечает"):
                         break
-                    if attempt == 0:
-                        self.log("Пусто. Возможно, страница еще грузится или нужен вход/регистрация.")
-                        time.sleep(2)
+                    page_mark = time.time()
+                    nav_seconds = 0.0
+                    continue
+                page_restarts = 0
                 if len(items) == 0:
                     self.log("Данные не получены. Останавливаемся.")
                     break
 
-                for item in items:
-                    item["Main_Category"] = selected_main_cat_name
-                    item["Sub_Group"] = selected_sub["group"]
-                    item["Sub_Category"] = selected_sub["name"]
+                rows = dedup.add(
+                    [i["Title_CN"] for i in items], [i["Image"] for i in items], [i["Link"] for i in items]
+                )
+                cluster_ids = dedup.cluster_ids(rows)
+                export_rows.extend(rows.tolist())
+                written_ids.extend(cluster_ids)
+                for item, cluster_id in zip(items, cluster_ids):
+                    item.update(labels)
+                    item["Cluster_ID"] = cluster_id
 
                 if items:
                     df = pd.DataFrame(items)
@@ -511,34 +1484,89 @@ class ScraperApp:
                         json.dump(existing, f, ensure_ascii=False)
 
                     total_items_collected += len(items)
+                    self.crawl_items = total_items_collected
                     self.log(f"Собрано {len(items)} (Всего: {total_items_collected}). Сохранено в файл.")
 
+                usage = self._log_resource_usage()
+                self._remember_session()
+                self.health.record_page(timing["load"], time.time() - page_mark)
+                page_mark = time.time()
+                nav_seconds = 0.0
+
                 try:
                     if self.stop_requested:
                         self.log("Остановлено пользователем.")
                         break
 
-                    if not self._go_to_next_page(page_num, max_pages):
-                        break
+                    reason = self.health.check(usage)
+                    nav_started = time.time()
+                    if reason and page_num < max_pages:
+                        if not self._recycle_driver(url, page_num + 1, reason):
+                            break
+                        page_mark = time.time()
+                    elif not self._go_to_next_page(page_num, max_pages):
+                        if page_num >= max_pages or self._driver_responsive():
+                            break
+                        if not self._recycle_driver(url, page_num + 1, "браузер не отвечает"):
+                            break
+                        page_mark = time.time()
+                    else:
+                        nav_seconds = time.time() - nav_started
                     page_num += 1
                 except Exception:
                     break
+        finally:
+            self._finish_clusters(dedup, dedup_path, export_rows, written_ids, filename, json_filename)
 
-            if self.stop_requested:
-                self.log("Остановлено пользователем.")
-                final_message = "Работа остановлена."
-            self.log(f"ГОТОВО! Весь процесс завершен. Файл: {filename}")
-            self.log(f"JSON: {json_filename}")
+        summary = self.health.summary()
+        if summary:
+            self.log(summary)
+        self.log(f"ГОТОВО! Весь процесс завершен. Файл: {filename}")
+        self.log(f"JSON: {json_filename}")
+        return total_items_collected
+
+    def _finish_clusters(self, dedup, dedup_path, export_rows, written_ids, filename, json_filename):
+        try:
+            final_ids = dedup.cluster_ids(export_rows)
+            if final_ids != written_ids:
+                df = pd.read_csv(filename, sep=";", encoding="utf-8-sig", dtype=str, keep_default_na=False)
+                df["Cluster_ID"] = final_ids[: len(df)]
+                df.to_csv(filename, index=False, encoding="utf-8-sig", sep=";")
+
+                with open(json_filename, "r", encoding="utf-8") as f:
+                    items = json.load(f)
+                for item, cluster_id in zip(items, final_ids):
+                    item["Cluster_ID"] = cluster_id
+                with open(json_filename, "w", encoding="utf-8") as f:
+                    json.dump(items, f, ensure_ascii=False)
+                self.log("Номера групп дублей обновлены с учетом всех страниц.")
+            dedup.save(dedup_path)
         except Exception as exc:
-            self.log(f"Произошла ошибка: {exc}")
-            self.log("Не волнуйтесь, всё что успели собрать до этого момента - уже в файле CSV.")
-        finally:
-            if self.stop_requested:
-                self._close_driver()
-                self.log("Браузер закрыт.")
-            if log_final:
-                self.log(final_message)
-            self.running = False
+            self.log(f"Не удалось обновить группы дублей: {exc}")
+
+    def _get_export_dir(self):
+        export_dir = self.export_path_var.get().strip()
+        if not export_dir:
+            self.log("Укажите путь экспорта.")
+            return None
+        if not os.path.isdir(export_dir):
+            self.log("Путь экспорта не найден. Выберите существующую папку.")
+            return None
+        return export_dir
+
+    def _log_resource_usage(self):
+        usage = chrome_tree_usage(self.driver)
+        if not usage:
+            return None
+        self.session_peak_rss = max(self.session_peak_rss, usage["rss_mb"])
+        elapsed = time.time() - self.session_started if self.session_started else 0
+        cpu_percent = usage["cpu_seconds"] / elapsed * 100 if elapsed > 0 else 0.0
+        self.log(
+            f"  -> Chrome: {usage['processes']} проц., RSS {usage['rss_mb']:.0f} МБ "
+            f"(пик {self.session_peak_rss:.0f} МБ), собственная память {usage['private_mb']:.0f} МБ, "
+            f"CPU {usage['cpu_seconds']:.1f} с ({cpu_percent:.0f}% в среднем)"
+        )
+        return usage
 
     def _parse_index(self, value, max_len, label):
         try:
@@ -627,20 +1655,29 @@ class ScraperApp:
         self.subcategories_for_main = main_idx
 
     def _close_driver(self):
+        if self.driver:
+            self._log_resource_usage()
+            procs = chrome_tree_processes(self.driver)
+            quitter = threading.Thread(target=self._quit_driver, args=(self.driver,), daemon=True)
+            quitter.start()
+            quitter.join(DRIVER_PING_TIMEOUT)
+            kill_processes(procs)
+        self.driver = None
+        self.session_started = None
+
+    def _quit_driver(self, driver):
         try:
-            if self.driver:
-                self.driver.quit()
+            driver.quit()
         except Exception:
             pass
-        self.driver = None
 
-    def _get_total_pages(self):
+    def _get_total_pages(self, limit=MAX_PAGES):
         try:
             num_elem = self.driver.find_element(By.CSS_SELECTOR, ".fui-paging-total .fui-paging-num")
             digits = "".join(ch for ch in num_elem.text.strip() if ch.isdigit())
             total = int(digits) if digits else 0
             if total > 0:
-                return min(total, MAX_PAGES)
+                return min(total, limit)
         except Exception:
             return None
         return None